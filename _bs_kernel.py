@@ -0,0 +1,94 @@
+import math
+from numba import njit, prange
+
+# fastmath without the 'nnan'/'ninf' flags, as a spot price of zero legitimately gives log(0) = -inf
+FASTMATH = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+def norm_cdf(x: float) -> float:
+    """Standard normal cumulative distribution function of a scalar (matches scipy.special.ndtr)"""
+    return 0.5 * math.erfc(-x / math.sqrt(2.0))
+
+# the same function compiled for use inside the kernels
+ndtr = njit(fastmath=FASTMATH, cache=True)(norm_cdf)
+
+@njit(inline='always', fastmath=FASTMATH, cache=True)
+def bs_value(spot, strike, phi, fwd_factor, vol_t, df):
+    """Black-Scholes price of a single unexpired option, given its precomputed
+    forward factor, total volatility and discount factor"""
+    fwd = spot * fwd_factor
+    d1 = math.log(fwd / strike) / vol_t + 0.5 * vol_t
+    d2 = d1 - vol_t
+    return phi * df * (fwd * ndtr(phi * d1) - strike * ndtr(phi * d2))
+
+# largest number of elements passed to bs_batch_weighted as tuples; beyond this, unrolling stops paying off
+MAX_BASKET_SIZE = 8
+
+@njit(parallel=True, fastmath=FASTMATH, cache=True)
+def bs_batch_weighted(spots, strikes, phis, weights, fwd_factors, vol_ts, dfs, out):
+    """Black-Scholes price of a weighted basket of unexpired options over a grid of spot prices.
+    The weighted sum is accumulated per spot, so no (elements x spots) array of
+    individual option prices is ever materialized. The element parameters may be
+    1-D arrays or tuples; for tuples a version of the kernel is compiled (and cached)
+    for each basket size, with the loop over elements fully unrolled.
+    Parameters
+    ----------
+    spots : np.ndarray
+        1-D array of spot prices of underlying stock
+    strikes : np.ndarray or tuple
+        strike prices of options
+    phis : np.ndarray or tuple
+        option types (1 for call, -1 for put)
+    weights : np.ndarray or tuple
+        number of units or weights of each option
+    fwd_factors : np.ndarray or tuple
+        spot to forward conversion factors, exp((r - q) * tte)
+    vol_ts : np.ndarray or tuple
+        total volatilities to expiry, vol * sqrt(tte)
+    dfs : np.ndarray or tuple
+        discount factors to expiry, exp(-r * tte)
+    out : np.ndarray
+        1-D array the same length as spots, filled with the price of the basket at each spot
+    """
+    n = len(strikes)
+    m = spots.shape[0]
+    for j in prange(m):
+        spot = spots[j]
+        price = 0.0
+        for i in range(n):
+            price += weights[i] * bs_value(spot, strikes[i], phis[i], fwd_factors[i], vol_ts[i], dfs[i])
+        out[j] = price
+
+@njit(parallel=True, fastmath=FASTMATH, cache=True)
+def bs_grid_weighted(spots, strikes, phis, weights, fwd_factors, vol_ts, dfs, out):
+    """Black-Scholes price of a weighted basket of options over a grid of times and spot prices.
+    Options that have expired at a given time must be given zero weight (and finite
+    placeholder constants) at that time, so the loop over options needs no branch.
+    Parameters
+    ----------
+    spots : np.ndarray
+        1-D array of spot prices of underlying stock
+    strikes : np.ndarray
+        1-D array of strike prices of options
+    phis : np.ndarray
+        1-D array of option types (1 for call, -1 for put)
+    weights : np.ndarray
+        2-D array (times x options) of number of units or weights of each option
+    fwd_factors : np.ndarray
+        2-D array (times x options) of spot to forward conversion factors, exp((r - q) * tte)
+    vol_ts : np.ndarray
+        2-D array (times x options) of total volatilities to expiry, vol * sqrt(tte)
+    dfs : np.ndarray
+        2-D array (times x options) of discount factors to expiry, exp(-r * tte)
+    out : np.ndarray
+        2-D array (times x spots), filled with the price of the basket at each time and spot
+    """
+    n_times, n = weights.shape
+    m = spots.shape[0]
+    for cell in prange(n_times * m):
+        k = cell // m
+        j = cell % m
+        spot = spots[j]
+        price = 0.0
+        for i in range(n):
+            price += weights[k, i] * bs_value(spot, strikes[i], phis[i], fwd_factors[k, i], vol_ts[k, i], dfs[k, i])
+        out[k, j] = price
@@ -1,9 +1,58 @@
+import math
+import threading
 from typing import List
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, field
 import numpy as np
-from scipy.stats import norm
+from scipy.special import ndtr
+from _bs_kernel import norm_cdf, bs_batch_weighted, bs_grid_weighted, MAX_BASKET_SIZE
 
-@dataclass
+# number of recent price/greeks results memoized by each structured product
+CACHE_SIZE = 8
+
+# option type to phi, the sign of the option payoff
+TYPE_MAP = {
+    "call" : 1,
+    "put" : -1
+}
+
+def black_scholes_greeks(spot, strike, phi, time_to_exp, fwd_factor, vol_t, df, volatility, int_rate, div_yield) -> tuple:
+    """Price and greeks of unexpired options using the closed-form Black-Scholes expressions,
+    assembled from intermediates (d1, d2, pdf and cdfs) computed once. All option parameters
+    may be arrays, broadcast against each other and against spot.
+    Parameters
+    ----------
+    spot : float or np.ndarray
+        spot price of underlying stock
+    strike, phi, time_to_exp : float or np.ndarray
+        strike price, sign of payoff (1 for call, -1 for put) and time remaining to expiry of options
+    fwd_factor, vol_t, df : float or np.ndarray
+        spot to forward conversion factor, total volatility and discount factor to expiry of options
+    volatility, int_rate, div_yield : float
+        volatility, interest rate and dividend yield of underlying stock
+    Returns
+    -------
+    price, delta, gamma, theta, vega, rho : float or np.ndarray
+        price of options and their 1st derivatives with respect to spot, time, volatility
+        and interest rate, and 2nd derivative with respect to spot
+    """
+    div_df = fwd_factor * df
+    d1 = np.log(spot * fwd_factor / strike) / vol_t + 0.5 * vol_t
+    d2 = d1 - vol_t
+    pdf_d1 = np.exp(-0.5 * d1 * d1) / np.sqrt(2 * np.pi)
+    cdf_d1, cdf_d2 = ndtr(np.stack([phi * d1, phi * d2]))
+    spot_term = spot * div_df * cdf_d1
+    strike_term = strike * df * cdf_d2
+    price = phi * (spot_term - strike_term)
+    delta = phi * div_df * cdf_d1
+    gamma = div_df * pdf_d1 / (spot * vol_t)
+    vega = spot * div_df * pdf_d1 * np.sqrt(time_to_exp)
+    theta = (-0.5 * volatility * vega / time_to_exp
+             + phi * (div_yield * spot_term - int_rate * strike_term))
+    rho = phi * time_to_exp * strike_term
+    return price, delta, gamma, theta, vega, rho
+
+@dataclass(slots=True)
 class OptionElement:
     """Represents a single option element in a structured product."""
     type: str  # 'call' or 'put'
@@ -12,6 +61,7 @@ class OptionElement:
     volatility: float = 0.25 # volatility of underlying stock
     int_rate: float = 0.05 # current risk-free interest rate (continuously compounded annual rate)
     div_yield: float = 0.025 # dividend yield of underlying stock (continuously compounded annual rate)
+    phi: int = field(init=False, repr=False) # sign of option payoff (1 for call, -1 for put), set from type
 
     def validate(self):
         """Validate option parameters."""
@@ -26,11 +76,7 @@ class OptionElement:
         """Validate option paramaters on initialization and convert inputs."""
         self.validate()
         # remap inputs to numbers
-        type_map = {
-            "call" : 1,
-            "put" : -1
-        }
-        self.phi = type_map.get(self.type)
+        self.phi = TYPE_MAP.get(self.type)
         
     def bs_price(self, spot, t = 0) -> float:
         """Price of option using the Black-Scholes model.
@@ -45,91 +91,398 @@ class OptionElement:
         price : float
             price of the option
         """
-        assert np.all(spot) >= 0, "Spot price must be non-negative."
+        # a scalar spot is priced with the math module, avoiding numpy's per-call overhead
+        scalar = isinstance(spot, (int, float))
+        assert spot >= 0 if scalar else np.all(np.asarray(spot) >= 0), "Spot price must be non-negative."
         assert t <= self.time_to_expiry, "Time remaing to expiry must be non-negative."
         
         time_to_exp = self.time_to_expiry - t
         if time_to_exp == 0:
-            price =  np.maximum((self.phi * (spot - self.strike)), 0)
+            if scalar:
+                price = max(self.phi * (spot - self.strike), 0)
+            else:
+                price = np.maximum((self.phi * (spot - self.strike)), 0)
+        elif scalar and spot > 0: # math.log(0) raises, so a zero spot takes the numpy path
+            fwd = spot * math.exp((self.int_rate - self.div_yield) * time_to_exp)
+            vol_t = self.volatility * math.sqrt(time_to_exp)
+            d1 = math.log(fwd / self.strike) / vol_t + 0.5 * vol_t
+            d2 = d1 - vol_t
+            df = math.exp(-self.int_rate * time_to_exp)
+            price = fwd * norm_cdf(self.phi * d1) - self.strike * norm_cdf(self.phi * d2)
+            price *= self.phi * df
         else:
             fwd = spot * np.exp((self.int_rate - self.div_yield) * time_to_exp)
             vol_t = self.volatility * np.sqrt(time_to_exp)
             d1 = np.log(fwd / self.strike) / vol_t + 0.5 * vol_t
             d2 = d1 - vol_t
             df = np.exp(-self.int_rate * time_to_exp)
-            price = fwd * norm.cdf(self.phi * d1) - self.strike * norm.cdf(self.phi * d2)
+            price = fwd * ndtr(self.phi * d1) - self.strike * ndtr(self.phi * d2)
             price *= self.phi * df
         return price
 
-@dataclass
+    def bs_greeks(self, spot, t = 0) -> tuple:
+        """Price and greeks of option using the closed-form Black-Scholes expressions.
+        Parameters
+        ----------
+        spot : float
+            spot price of underlying stock
+        t : float
+            current time (time elapsed since contract inception) in years
+        Returns
+        -------
+        price : float
+            price of the option
+        delta : float
+            1st derivative of price with respect to spot
+        gamma : float
+            2nd derivative of price with respect to spot
+        theta : float
+            1st derivative of price with respect to time
+        vega : float
+            1st derivative of price with respect to volatility
+        rho : float
+            1st derivative of price with respect to interest rate
+        """
+        assert np.all(np.asarray(spot) >= 0), "Spot price must be non-negative."
+        assert t <= self.time_to_expiry, "Time remaing to expiry must be non-negative."
+        
+        time_to_exp = self.time_to_expiry - t
+        if time_to_exp == 0:
+            price = np.maximum((self.phi * (spot - self.strike)), 0)
+            delta = self.phi * np.greater(self.phi * (spot - self.strike), 0).astype(float)
+            gamma = theta = vega = rho = 0 * delta
+            return price, delta, gamma, theta, vega, rho
+        return black_scholes_greeks(spot, self.strike, self.phi, time_to_exp,
+                                    np.exp((self.int_rate - self.div_yield) * time_to_exp),
+                                    self.volatility * np.sqrt(time_to_exp),
+                                    np.exp(-self.int_rate * time_to_exp),
+                                    self.volatility, self.int_rate, self.div_yield)
+
 class StructuredProduct:
     """Represents a structured product composed of multiple option elements."""
-    elements: List[OptionElement] # List of option elements
-    weights: np.array # Array of number of units or weights of each option
-    volatility: float # volatility of underlying stock
-    int_rate: float # current risk-free interest rate (continuously compounded annual rate)
-    div_yield: float # dividend yield of underlying stock (continuously compounded annual rate)
+    __slots__ = ('elements', 'weights', 'volatility', 'int_rate', 'div_yield',
+                 '_types', '_strikes', '_phis', '_ttes', '_weights', '_constants',
+                 '_cache', '_lock')
     
-    def __post_init__(self):
-        """Validate structured product parameters"""
-        assert len(self.elements) == len(self.weights), "Number of elements must match number of weights"
+    def __init__(self,
+                 elements: List[OptionElement],
+                 weights: np.ndarray,
+                 volatility: float,
+                 int_rate: float,
+                 div_yield: float):
+        """Create and validate a structured product.
+        Parameters
+        ----------
+        elements : List[OptionElement]
+            List of option elements (their strikes, types and expiries are read into arrays
+            here; after editing or adding elements, call reset_parameters to apply the changes)
+        weights : np.ndarray
+            Array of number of units or weights of each option (held as a read-only float array)
+        volatility : float
+            Volatility of underlying stock
+        int_rate : float
+            Current risk-free interest rate (continuously compounded annual rate)
+        div_yield : float
+            Dividend yield of underlying stock (continuously compounded annual rate)
+        """
+        self._types = None # only set for products created from arrays
+        self._lock = threading.Lock()
+        self.elements = elements
+        self.weights = weights
+        self.volatility = volatility
+        self.int_rate = int_rate
+        self.div_yield = div_yield
+        self.validate()
+        # Ensure all options have common vol, int_rate, & div_yield, unless they already do
+        if any((element.volatility, element.int_rate, element.div_yield)
+               != (self.volatility, self.int_rate, self.div_yield) for element in self.elements):
+            self.reset_parameters()
+    
+    def __repr__(self):
+        return (f"{type(self).__name__}(elements={self.elements!r}, weights={self.weights!r}, "
+                f"volatility={self.volatility!r}, int_rate={self.int_rate!r}, div_yield={self.div_yield!r})")
+    
+    def __getstate__(self):
+        """State for copying and pickling, leaving out the memo and its lock"""
+        return {name: getattr(self, name) for name in self.__slots__
+                if name not in ('_cache', '_lock') and hasattr(self, name)}
+    
+    def __setstate__(self, state):
+        """Restore state for copying and pickling, with an empty memo and a new lock"""
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, '_cache', OrderedDict())
+        object.__setattr__(self, '_lock', threading.Lock())
+    
+    def validate(self):
+        """Validate structured product parameters."""
+        assert len(self._strikes) == len(self.weights), "Number of elements must match number of weights"
         assert all(w != 0 for w in self.weights), "Weights cannot be zero"
-        self.reset_parameters() # Ensure all options have common vol, int_rate, & div_yield
+        assert np.all(self._strikes >= 0), "Strike price must be non-negative."
+        assert np.all(self._ttes >= 0), "Time to expiry must be non-negative."
+        assert self.volatility >= 0, "Volatility must be non-negative."
+        assert self.int_rate >= 0, "Interest rate must be non-negative."
+        assert self.div_yield >= 0, "Dividend yield rate must be non-negative."
+        
+    @classmethod
+    def from_arrays(cls,
+                    types: List[str],
+                    strikes: np.ndarray,
+                    times_to_expiry: np.ndarray,
+                    weights: np.ndarray,
+                    volatility: float,
+                    int_rate: float,
+                    div_yield: float) -> 'StructuredProduct':
+        """Creates a structured product directly from arrays of element parameters,
+        without constructing an OptionElement for each element
+        Parameters
+        ----------
+        types : List[str]
+            Type of each option element ('call' or 'put')
+        strikes : np.ndarray
+            Strike price of each option element
+        times_to_expiry : np.ndarray
+            Time to expiry (maturity) of each option element in years
+        weights : np.ndarray
+            Number of units or weights of each option element
+        volatility : float
+            Volatility of underlying stock
+        int_rate : float
+            Risk-free interest rate (continuously compounded annual rate)
+        div_yield : float
+            Dividend yield of underlying stock (continuously compounded annual rate)
+        Returns
+        -------
+        product : StructuredProduct
+        """
+        assert all(option_type in TYPE_MAP for option_type in types), "Option type must be 'call' or 'put'."
+        assert len(types) == len(strikes) == len(times_to_expiry), "Number of types, strikes and times to expiry must match"
+        product = cls.__new__(cls)
+        product._types = list(types)
+        product._lock = threading.Lock()
+        product._strikes = np.ascontiguousarray(strikes, dtype=np.float64)
+        product._phis = np.ascontiguousarray([TYPE_MAP[option_type] for option_type in types], dtype=np.float64)
+        product._ttes = np.ascontiguousarray(times_to_expiry, dtype=np.float64)
+        product._constants = None
+        product.weights = weights
+        product.volatility = volatility
+        product.int_rate = int_rate
+        product.div_yield = div_yield
+        product.validate()
+        return product
+    
+    def __getattr__(self, name):
+        """Construct the option elements on first access, for products created from arrays.
+        They match the arrays already held, so are set without invalidating any cached results."""
+        if name == 'elements' and self._types is not None:
+            elements = [OptionElement(type=option_type,
+                                      strike=float(strike),
+                                      time_to_expiry=float(time_to_expiry),
+                                      volatility=self.volatility,
+                                      int_rate=self.int_rate,
+                                      div_yield=self.div_yield)
+                        for option_type, strike, time_to_expiry in zip(self._types, self._strikes, self._ttes)]
+            super().__setattr__('elements', elements)
+            return elements
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+    
+    def __setattr__(self, name, value):
+        """Keep contiguous float64 arrays of the elements' parameters and of the weights
+        in sync with the elements and weights, as all pricing math operates on these,
+        and drop memoized results whenever a product parameter changes. The weights are
+        stored as a read-only array, so they can only be changed by assigning new ones;
+        edits to the elements themselves are applied by reset_parameters."""
+        if name == 'weights':
+            value = np.array(value, dtype=np.float64) # copy, so the caller's array is not frozen
+            value.setflags(write=False)
+        super().__setattr__(name, value)
+        if not name.startswith('_'):
+            self._cache = OrderedDict()
+        if name == 'elements':
+            self._read_elements()
+        elif name == 'weights':
+            self._weights = value
+            self._constants = None
+        
+    def _read_elements(self):
+        """Read the elements' strikes, phis and times to expiry into the arrays used for pricing"""
+        self._strikes = np.ascontiguousarray([element.strike for element in self.elements], dtype=np.float64)
+        self._phis = np.ascontiguousarray([element.phi for element in self.elements], dtype=np.float64)
+        self._ttes = np.ascontiguousarray([element.time_to_expiry for element in self.elements], dtype=np.float64)
+        self._constants = None
         
     def reset_parameters(self):
-        """Ensures elements' vol and rates parameters are reset to product parameters"""
+        """Ensures elements' vol and rates parameters are reset to product parameters,
+        and re-reads the elements, so edits made to them since are priced"""
         for element in self.elements:
             element.volatility = self.volatility
             element.int_rate = self.int_rate
             element.div_yield = self.div_yield
+        self._read_elements()
+        self.validate()
+        self._cache.clear()
                 
+    def _time_constants(self, t) -> tuple:
+        """Strike, phi, weight, time to expiry, forward factor, total volatility and discount
+        factor of each element still live at time t, the strike, phi and weight of each element
+        that has expired at t, and the live elements as a basket of tuples (or None), cached for
+        repeated pricing at the same t and parameters. The cache is swapped in as a single
+        tuple, so concurrent calls at different t never see each other's constants."""
+        key = (t, self.volatility, self.int_rate, self.div_yield)
+        constants = self._constants
+        if constants is None or constants[0] != key:
+            time_to_exp = self._ttes - t
+            assert np.all(time_to_exp >= 0), "Time remaing to expiry must be non-negative."
+            # partition once per t, so no pricing loop branches on expiry
+            live = time_to_exp > 0
+            expired = ~live
+            time_to_exp = time_to_exp[live]
+            fwd_factors = np.exp((self.int_rate - self.div_yield) * time_to_exp)
+            vol_ts = self.volatility * np.sqrt(time_to_exp)
+            dfs = np.exp(-self.int_rate * time_to_exp)
+            live = (self._strikes[live], self._phis[live], self._weights[live],
+                    time_to_exp, fwd_factors, vol_ts, dfs)
+            expired = (self._strikes[expired], self._phis[expired], self._weights[expired])
+            # small products are priced by a version of the kernel specialized on their number of elements,
+            # by passing the element parameters and weights as fixed-length tuples
+            if 0 < len(time_to_exp) <= MAX_BASKET_SIZE:
+                basket = tuple(tuple(array.tolist()) for array in live[:3] + live[4:])
+            else:
+                basket = None
+            constants = (key, live, expired, basket)
+            self._constants = constants
+        return constants[1:]
+    
+    def _expired_values(self, spot, expired) -> tuple:
+        """Weighted payoff and delta of the expired elements, given as
+        returned by _time_constants"""
+        shape = (-1,) + (1,) * spot.ndim
+        strikes, phis, weights = expired
+        moneyness = phis.reshape(shape) * (spot - strikes.reshape(shape))
+        payoff = np.einsum('i,i...->...', weights, np.maximum(moneyness, 0))
+        delta = np.einsum('i,i...->...', weights * phis, moneyness > 0)
+        return payoff, delta
+    
+    def _cached(self, compute, spot, t, index=None):
+        """Result of compute(spot, t), or its rows at index, memoized per product on the
+        spot values and t for the last CACHE_SIZE calls, so repeated requests at the same
+        point are not repriced. The memo is guarded by a lock, so a product can be
+        shared between threads."""
+        spot = np.asarray(spot, dtype=float)
+        assert np.all(spot >= 0), "Spot price must be non-negative."
+        key = (compute.__name__, spot.shape, spot.tobytes(), t)
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+        if result is None:
+            result = compute(spot, t)
+            with self._lock:
+                self._cache[key] = result
+                if len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        if index is not None:
+            result = result[index]
+        if isinstance(result, np.ndarray):
+            result = result.copy() # callers cannot modify the memoized result
+        return result
+    
     def price(self, spot, t) -> float:
-        """Price the product using the Black-Shcoles model for underlying options"""
-        prices = np.array([element.bs_price(spot, t) for element in self.elements])
-        wts = self.weights
-        if prices.shape != wts.shape: # in case spot is an array
-            wts = wts[:, np.newaxis]
-        prices = prices * wts
-        price = np.sum(prices, axis=0)
-        return price
+        """Price the product using the Black-Shcoles model for underlying options,
+        evaluating all elements in a single compiled pass"""
+        return self._cached(self._bs_price, spot, t)
+    
+    def _bs_price(self, spot, t) -> float:
+        """Price of the product at each spot, without memoization"""
+        live, expired, basket = self._time_constants(t)
+        strikes, phis, weights, _, fwd_factors, vol_ts, dfs = live
+        price = np.empty(spot.size)
+        if basket is not None:
+            bs_batch_weighted(spot.ravel(), *basket, price)
+        else:
+            bs_batch_weighted(spot.ravel(), strikes, phis, weights, fwd_factors, vol_ts, dfs, price)
+        price = price.reshape(spot.shape)
+        if len(expired[0]):
+            price += self._expired_values(spot, expired)[0]
+        return price[()] # [()] unwraps a scalar spot
+    
+    def price_grid(self, spots, ts) -> np.ndarray:
+        """Price the product over a grid of spot prices and times in a single compiled pass
+        Parameters
+        ----------
+        spots : np.ndarray
+            1-D array of spot prices of underlying stock
+        ts : np.ndarray
+            1-D array of current times (time elapsed since contract inception) in years
+        Returns
+        -------
+        prices : np.ndarray
+            array of shape (len(ts), len(spots)) with the price of the product at each time and spot
+        """
+        spots = np.ascontiguousarray(spots, dtype=np.float64)
+        ts = np.asarray(ts, dtype=np.float64)
+        assert spots.ndim == 1 and ts.ndim == 1, "Spot prices and times must be 1-D arrays."
+        assert np.all(spots >= 0), "Spot price must be non-negative."
+        time_to_exp = self._ttes - ts[:, np.newaxis] # times along axis 0, elements along axis 1
+        assert np.all(time_to_exp >= 0), "Time remaing to expiry must be non-negative."
+        expired = time_to_exp == 0
+        # expired options get zero weight in the kernel, with a placeholder time keeping it finite
+        live_time = np.where(expired, 1, time_to_exp)
+        fwd_factors = np.exp((self.int_rate - self.div_yield) * live_time)
+        vol_ts = self.volatility * np.sqrt(live_time)
+        dfs = np.exp(-self.int_rate * live_time)
+        weights = np.where(expired, 0, self._weights)
+        prices = np.empty((len(ts), len(spots)))
+        bs_grid_weighted(spots, self._strikes, self._phis, weights, fwd_factors, vol_ts, dfs, prices)
+        if expired.any():
+            # expired options are worth their payoff
+            payoffs = np.maximum(self._phis[:, np.newaxis] * (spots - self._strikes[:, np.newaxis]), 0)
+            prices += np.where(expired, self._weights, 0) @ payoffs
+        return prices
+    
+    def _greeks(self, spot, t, index) -> np.ndarray:
+        """Rows at index of the product's price, delta, gamma, theta, vega and rho, weighting
+        the closed-form values of each element, assembled from shared intermediates"""
+        return self._cached(self._bs_greeks, spot, t, index)
+    
+    def _bs_greeks(self, spot, t) -> np.ndarray:
+        """Price and greeks of the product at each spot, without memoization"""
+        live, expired, _ = self._time_constants(t)
+        strikes, phis, weights, time_to_exp, fwd_factors, vol_ts, dfs = live
+        # live elements along axis 0, broadcast against the shape of spot
+        shape = (-1,) + (1,) * spot.ndim
+        values = black_scholes_greeks(spot, strikes.reshape(shape), phis.reshape(shape), time_to_exp.reshape(shape),
+                                      fwd_factors.reshape(shape), vol_ts.reshape(shape), dfs.reshape(shape),
+                                      self.volatility, self.int_rate, self.div_yield)
+        # weight and sum each greek over the elements, into a fresh array per call
+        greeks = np.stack([np.einsum('i,i...->...', weights, greek) for greek in values])
+        if len(expired[0]):
+            # expired options only contribute their payoff and its slope
+            greeks[:2] += self._expired_values(spot, expired)
+        return greeks
+    
+    def get_greeks(self, spot, t) -> tuple:
+        """Price, delta, gamma, theta and vega of the product in one call,
+        sharing a single evaluation of the elements' intermediates"""
+        price, delta, gamma, theta, vega = self._greeks(spot, t, slice(5))
+        return price, delta, gamma, theta, vega
     
     def get_delta(self, spot, t) -> float:
-        """Delta of the product (1st derivative with respect to price) 
-        using finite differencing"""
-        dS = spot / 1000
-        price0 = self.price(spot, t)
-        price1 = self.price(spot + dS, t)
-        delta = (price1 - price0) / dS
-        return delta
+        """Delta of the product (1st derivative with respect to price)"""
+        return self._greeks(spot, t, 1)
     
     def get_gamma(self, spot, t) -> float:
-        """Gamma of the product (2nd derivative with respect to price) 
-        using finite differencing"""
-        dS = spot / 100
-        price0 = self.price(spot, t)
-        price1 = self.price(spot + dS, t)
-        price2 = self.price(spot + (2 * dS), t)
-        gamma = (price2 - 2 * price1 + price0) / dS**2
-        return gamma
+        """Gamma of the product (2nd derivative with respect to price)"""
+        return self._greeks(spot, t, 2)
     
     def get_theta(self, spot, t) -> float:
-        """Theta of the product (1st derivative with respect to price)
-        using finite differencing"""
-        dT = 1/250 # 1 trading day earlier
-        price0 = self.price(spot, t - dT)
-        price1 = self.price(spot, t)
-        theta = (price1 - price0) / dT
-        return theta
+        """Theta of the product (1st derivative with respect to time)"""
+        return self._greeks(spot, t, 3)
     
     def get_vega(self, spot, t) -> float:
-        """Theta of the product (1st derivative with respect to volatility)
-        using finite differencing"""
-        dV = 0.0001 # 1 basis point
-        price0 = self.price(spot, t)
-        for element in self.elements:
-            element.volatility += dV
-        price1 = self.price(spot, t)
-        vega = (price1 - price0) / dV
-        self.reset_parameters()
-        return vega
-    
\ No newline at end of file
+        """Vega of the product (1st derivative with respect to volatility)"""
+        return self._greeks(spot, t, 4)
+    
+    def get_rho(self, spot, t) -> float:
+        """Rho of the product (1st derivative with respect to interest rate)"""
+        return self._greeks(spot, t, 5)
@@ -28,19 +28,18 @@ class StructuredProductFactory:
         product : StructuredProduct
         """    
         # Synthetic forward elements
-        elements = [options.OptionElement(type='call', 
-                                          strike=fwd_price,
-                                          time_to_expiry=time_to_exp),
-                    options.OptionElement(type='put', 
-                                          strike=fwd_price,
-                                          time_to_expiry=time_to_exp)]
+        types = ['call', 'put']
+        strikes = np.array([fwd_price, fwd_price])
+        times_to_expiry = np.full(2, time_to_exp)
         # Long call short put
         weights = np.array([1, -1])
-        product = options.StructuredProduct(elements=elements, 
-                                            weights=weights,
-                                            volatility=volatility,
-                                            int_rate=int_rate,
-                                            div_yield=div_yield)
+        product = options.StructuredProduct.from_arrays(types=types,
+                                                        strikes=strikes,
+                                                        times_to_expiry=times_to_expiry,
+                                                        weights=weights,
+                                                        volatility=volatility,
+                                                        int_rate=int_rate,
+                                                        div_yield=div_yield)
         return product
                 
     @classmethod
@@ -71,19 +70,18 @@ class StructuredProductFactory:
         product : StructuredProduct
         """
         # Construct bull spread elements
-        elements = [options.OptionElement(type='call', 
-                                          strike=lower_strike,
-                                          time_to_expiry=time_to_exp),
-                    options.OptionElement(type='call', 
-                                          strike=upper_strike,
-                                          time_to_expiry=time_to_exp)]
+        types = ['call', 'call']
+        strikes = np.array([lower_strike, upper_strike])
+        times_to_expiry = np.full(2, time_to_exp)
         # long, short
         weights = np.array([1, -1])
-        product = options.StructuredProduct(elements=elements, 
-                                            weights=weights,
-                                            volatility=volatility,
-                                            int_rate=int_rate,
-                                            div_yield=div_yield)
+        product = options.StructuredProduct.from_arrays(types=types,
+                                                        strikes=strikes,
+                                                        times_to_expiry=times_to_expiry,
+                                                        weights=weights,
+                                                        volatility=volatility,
+                                                        int_rate=int_rate,
+                                                        div_yield=div_yield)
         return product
     
     @classmethod
@@ -114,19 +112,18 @@ class StructuredProductFactory:
         product : StructuredProduct
         """
         # Construct bear spread elements
-        elements = [options.OptionElement(type='put', 
-                                          strike=lower_strike,
-                                          time_to_expiry=time_to_exp),
-                    options.OptionElement(type='put', 
-                                          strike=upper_strike,
-                                          time_to_expiry=time_to_exp)]
+        types = ['put', 'put']
+        strikes = np.array([lower_strike, upper_strike])
+        times_to_expiry = np.full(2, time_to_exp)
         # short, long
         weights = np.array([-1, 1])
-        product = options.StructuredProduct(elements=elements, 
-                                            weights=weights,
-                                            volatility=volatility,
-                                            int_rate=int_rate,
-                                            div_yield=div_yield)
+        product = options.StructuredProduct.from_arrays(types=types,
+                                                        strikes=strikes,
+                                                        times_to_expiry=times_to_expiry,
+                                                        weights=weights,
+                                                        volatility=volatility,
+                                                        int_rate=int_rate,
+                                                        div_yield=div_yield)
         return product
     
     @classmethod
@@ -154,19 +151,18 @@ class StructuredProductFactory:
         product : StructuredProduct
         """
         # Straddle elements
-        elements = [options.OptionElement(type='call', 
-                                          strike=strike,
-                                          time_to_expiry=time_to_exp),
-                    options.OptionElement(type='put', 
-                                          strike=strike,
-                                          time_to_expiry=time_to_exp)]
+        types = ['call', 'put']
+        strikes = np.array([strike, strike])
+        times_to_expiry = np.full(2, time_to_exp)
         # call and put at same strike
         weights = np.array([1, 1])
-        product = options.StructuredProduct(elements=elements,
-                                            weights=weights,
-                                            volatility=volatility,
-                                            int_rate=int_rate,
-                                            div_yield=div_yield)
+        product = options.StructuredProduct.from_arrays(types=types,
+                                                        strikes=strikes,
+                                                        times_to_expiry=times_to_expiry,
+                                                        weights=weights,
+                                                        volatility=volatility,
+                                                        int_rate=int_rate,
+                                                        div_yield=div_yield)
         return product
     
     @classmethod
@@ -197,19 +193,18 @@ class StructuredProductFactory:
         product : StructuredProduct
         """
         # Strangle elements
-        elements = [options.OptionElement(type='put', 
-                                          strike=lower_strike,
-                                          time_to_expiry=time_to_exp),
-                    options.OptionElement(type='call', 
-                                          strike=upper_strike,
-                                          time_to_expiry=time_to_exp)]
+        types = ['put', 'call']
+        strikes = np.array([lower_strike, upper_strike])
+        times_to_expiry = np.full(2, time_to_exp)
         # call and put at same strike
         weights = np.array([1, 1])
-        product = options.StructuredProduct(elements=elements,
-                                            weights=weights,
-                                            volatility=volatility,
-                                            int_rate=int_rate,
-                                            div_yield=div_yield)
+        product = options.StructuredProduct.from_arrays(types=types,
+                                                        strikes=strikes,
+                                                        times_to_expiry=times_to_expiry,
+                                                        weights=weights,
+                                                        volatility=volatility,
+                                                        int_rate=int_rate,
+                                                        div_yield=div_yield)
         return product    
         
     @classmethod
@@ -240,22 +235,18 @@ class StructuredProductFactory:
         product : StructuredProduct
         """
         # Construct butterfly spread elements
-        elements = [options.OptionElement(type='call', 
-                                          strike=center_strike - width/2,
-                                          time_to_expiry=time_to_exp),
-                    options.OptionElement(type='call', 
-                                          strike=center_strike,
-                                          time_to_expiry=time_to_exp),
-                    options.OptionElement(type='call', 
-                                          strike=center_strike + width/2,
-                                          time_to_expiry=time_to_exp)]
+        types = ['call', 'call', 'call']
+        strikes = np.array([center_strike - width/2, center_strike, center_strike + width/2])
+        times_to_expiry = np.full(3, time_to_exp)
         # long the wings, short the center
         weights = np.array([1, -2, 1])
-        product = options.StructuredProduct(elements=elements, 
-                                            weights=weights,
-                                            volatility=volatility,
-                                            int_rate=int_rate,
-                                            div_yield=div_yield)
+        product = options.StructuredProduct.from_arrays(types=types,
+                                                        strikes=strikes,
+                                                        times_to_expiry=times_to_expiry,
+                                                        weights=weights,
+                                                        volatility=volatility,
+                                                        int_rate=int_rate,
+                                                        div_yield=div_yield)
         return product
 
     @classmethod
@@ -289,25 +280,18 @@ class StructuredProductFactory:
         product : StructuredProduct
         """
         # Construct butterfly spread elements
-        elements = [options.OptionElement(type='call', 
-                                          strike=lower_strike - width/2,
-                                          time_to_expiry=time_to_exp),
-                    options.OptionElement(type='call',
-                                          strike=lower_strike,
-                                          time_to_expiry=time_to_exp),
-                    options.OptionElement(type='call', 
-                                          strike=upper_strike,
-                                          time_to_expiry=time_to_exp),
-                    options.OptionElement(type='call', 
-                                          strike=upper_strike + width/2,
-                                          time_to_expiry=time_to_exp)]
+        types = ['call', 'call', 'call', 'call']
+        strikes = np.array([lower_strike - width/2, lower_strike, upper_strike, upper_strike + width/2])
+        times_to_expiry = np.full(4, time_to_exp)
         # long the wings, short the center
         weights = np.array([1, -1, -1, 1])
-        product = options.StructuredProduct(elements=elements, 
-                                            weights=weights,
-                                            volatility=volatility,
-                                            int_rate=int_rate,
-                                            div_yield=div_yield)
+        product = options.StructuredProduct.from_arrays(types=types,
+                                                        strikes=strikes,
+                                                        times_to_expiry=times_to_expiry,
+                                                        weights=weights,
+                                                        volatility=volatility,
+                                                        int_rate=int_rate,
+                                                        div_yield=div_yield)
         return product
 
     @classmethod
@@ -341,22 +325,18 @@ class StructuredProductFactory:
         product : StructuredProduct
         """
         # Construct call xmas tree spread elements
-        elements = [options.OptionElement(type='call', 
-                                          strike=lower_strike,
-                                          time_to_expiry=time_to_exp),
-                    options.OptionElement(type='call', 
-                                          strike=center_strike,
-                                          time_to_expiry=time_to_exp),
-                    options.OptionElement(type='call', 
-                                          strike=upper_strike,
-                                          time_to_expiry=time_to_exp)]
+        types = ['call', 'call', 'call']
+        strikes = np.array([lower_strike, center_strike, upper_strike])
+        times_to_expiry = np.full(3, time_to_exp)
         # long, short, short
         weights = np.array([1, -1, -1])
-        product = options.StructuredProduct(elements=elements, 
-                                            weights=weights,
-                                            volatility=volatility,
-                                            int_rate=int_rate,
-                                            div_yield=div_yield)
+        product = options.StructuredProduct.from_arrays(types=types,
+                                                        strikes=strikes,
+                                                        times_to_expiry=times_to_expiry,
+                                                        weights=weights,
+                                                        volatility=volatility,
+                                                        int_rate=int_rate,
+                                                        div_yield=div_yield)
         return product
     
     @classmethod
@@ -390,22 +370,18 @@ class StructuredProductFactory:
         product : StructuredProduct
         """
         # Construct put xmas tree spread elements
-        elements = [options.OptionElement(type='put', 
-                                          strike=lower_strike,
-                                          time_to_expiry=time_to_exp),
-                    options.OptionElement(type='put', 
-                                          strike=center_strike,
-                                          time_to_expiry=time_to_exp),
-                    options.OptionElement(type='put', 
-                                          strike=upper_strike,
-                                          time_to_expiry=time_to_exp)]
+        types = ['put', 'put', 'put']
+        strikes = np.array([lower_strike, center_strike, upper_strike])
+        times_to_expiry = np.full(3, time_to_exp)
         # short, short, long
         weights = np.array([-1, -1, 1])
-        product = options.StructuredProduct(elements=elements, 
-                                            weights=weights,
-                                            volatility=volatility,
-                                            int_rate=int_rate,
-                                            div_yield=div_yield)
+        product = options.StructuredProduct.from_arrays(types=types,
+                                                        strikes=strikes,
+                                                        times_to_expiry=times_to_expiry,
+                                                        weights=weights,
+                                                        volatility=volatility,
+                                                        int_rate=int_rate,
+                                                        div_yield=div_yield)
         return product
     
     @classmethod
@@ -436,17 +412,16 @@ class StructuredProductFactory:
         product : StructuredProduct
         """
         # Straddle elements
-        elements = [options.OptionElement(type='call', 
-                                          strike=strike,
-                                          time_to_expiry=near_time_to_exp),
-                    options.OptionElement(type='call', 
-                                          strike=strike,
-                                          time_to_expiry=far_time_to_exp)]
+        types = ['call', 'call']
+        strikes = np.array([strike, strike])
+        times_to_expiry = np.array([near_time_to_exp, far_time_to_exp])
         # short the near term expiry and long the far term expiry
         weights = np.array([-1, 1])
-        product = options.StructuredProduct(elements=elements,
-                                            weights=weights,
-                                            volatility=volatility,
-                                            int_rate=int_rate,
-                                            div_yield=div_yield)
+        product = options.StructuredProduct.from_arrays(types=types,
+                                                        strikes=strikes,
+                                                        times_to_expiry=times_to_expiry,
+                                                        weights=weights,
+                                                        volatility=volatility,
+                                                        int_rate=int_rate,
+                                                        div_yield=div_yield)
         return product
\ No newline at end of file
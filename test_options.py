@@ -0,0 +1,226 @@
+import copy
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from scipy.special import ndtr
+
+import _bs_kernel
+from options import OptionElement, StructuredProduct
+from optionsfactory import StructuredProductFactory
+
+VOLATILITY = 0.3
+INT_RATE = 0.06
+DIV_YIELD = 0.01
+TIME_TO_EXP = 30/360
+SPOTS = np.linspace(67.5, 132.5, 53)
+
+def make_products():
+    """One of each factory product, plus a basket too large for the tuple-specialized kernel"""
+    params = dict(volatility=VOLATILITY, int_rate=INT_RATE, div_yield=DIV_YIELD)
+    products = {
+        'synthetic_forward': StructuredProductFactory.synthetic_forward(100, TIME_TO_EXP, **params),
+        'bull_spread': StructuredProductFactory.bull_spread(90, 110, TIME_TO_EXP, **params),
+        'bear_spread': StructuredProductFactory.bear_spread(90, 110, TIME_TO_EXP, **params),
+        'straddle': StructuredProductFactory.straddle(100, TIME_TO_EXP, **params),
+        'strangle': StructuredProductFactory.strangle(90, 110, TIME_TO_EXP, **params),
+        'butterfly': StructuredProductFactory.butterfly(30, 100, TIME_TO_EXP, **params),
+        'condor': StructuredProductFactory.condor(20, 90, 110, TIME_TO_EXP, **params),
+        'call_xmastree': StructuredProductFactory.call_xmastree(90, 100, 110, TIME_TO_EXP, **params),
+        'put_xmastree': StructuredProductFactory.put_xmastree(90, 100, 110, TIME_TO_EXP, **params),
+        'calendar_spread': StructuredProductFactory.calendar_spread(100, TIME_TO_EXP, 2 * TIME_TO_EXP, **params),
+    }
+    n = _bs_kernel.MAX_BASKET_SIZE + 4
+    products['large_basket'] = StructuredProduct.from_arrays(types=['call', 'put'] * (n // 2),
+                                                             strikes=np.linspace(80, 120, n),
+                                                             times_to_expiry=np.linspace(TIME_TO_EXP, 3 * TIME_TO_EXP, n),
+                                                             weights=np.arange(1, n + 1) * (-1) ** np.arange(n),
+                                                             **params)
+    return products
+
+PRODUCTS = make_products()
+
+def element_prices(product, spot, t):
+    """Weighted sum of OptionElement.bs_price over the product's elements"""
+    return sum(weight * element.bs_price(spot, t) for element, weight in zip(product.elements, product.weights))
+
+@pytest.mark.parametrize('cdf', [_bs_kernel.norm_cdf, _bs_kernel.ndtr], ids=['python', 'compiled'])
+def test_norm_cdf_matches_scipy(cdf):
+    for x in np.linspace(-10, 10, 401):
+        assert cdf(x) == pytest.approx(ndtr(x), rel=1e-13, abs=1e-300)
+
+@pytest.mark.parametrize('name', PRODUCTS)
+@pytest.mark.parametrize('t', [0, TIME_TO_EXP / 2, TIME_TO_EXP])
+def test_price_matches_elements(name, t):
+    # at t = TIME_TO_EXP the near-dated elements have expired
+    product = PRODUCTS[name]
+    np.testing.assert_allclose(product.price(SPOTS, t), element_prices(product, SPOTS, t), rtol=1e-10, atol=1e-10)
+    assert product.price(100.0, t) == pytest.approx(element_prices(product, 100.0, t), rel=1e-10, abs=1e-10)
+
+@pytest.mark.parametrize('name', PRODUCTS)
+def test_price_grid_matches_price(name):
+    product = PRODUCTS[name]
+    ts = np.linspace(0, TIME_TO_EXP, 5)
+    grid = product.price_grid(SPOTS, ts)
+    assert grid.shape == (len(ts), len(SPOTS))
+    for prices, t in zip(grid, ts):
+        np.testing.assert_allclose(prices, product.price(SPOTS, t), rtol=1e-10, atol=1e-10)
+
+@pytest.mark.parametrize('name', PRODUCTS)
+@pytest.mark.parametrize('t', [0, TIME_TO_EXP / 2])
+def test_greeks_match_finite_differences(name, t):
+    product = PRODUCTS[name]
+    price, delta, gamma, theta, vega = product.get_greeks(SPOTS, t)
+    np.testing.assert_allclose(price, product.price(SPOTS, t), rtol=1e-10, atol=1e-10)
+    dS = 1e-3
+    up, down = product.price(SPOTS + dS, t), product.price(SPOTS - dS, t)
+    np.testing.assert_allclose(delta, (up - down) / (2 * dS), atol=1e-6)
+    np.testing.assert_allclose(gamma, (up - 2 * price + down) / dS**2, atol=1e-3)
+    dT = 1e-5
+    np.testing.assert_allclose(theta, (product.price(SPOTS, t + dT) - product.price(SPOTS, t - dT)) / (2 * dT), atol=1e-3)
+    # bump a copy of the product so the shared fixture keeps its parameters
+    bumped = StructuredProduct.from_arrays(types=['call' if phi == 1 else 'put' for phi in product._phis],
+                                           strikes=product._strikes,
+                                           times_to_expiry=product._ttes,
+                                           weights=product.weights,
+                                           volatility=VOLATILITY,
+                                           int_rate=INT_RATE,
+                                           div_yield=DIV_YIELD)
+    dV = 1e-6
+    bumped.volatility = VOLATILITY + dV
+    vol_up = bumped.price(SPOTS, t)
+    bumped.volatility = VOLATILITY - dV
+    vol_down = bumped.price(SPOTS, t)
+    np.testing.assert_allclose(vega, (vol_up - vol_down) / (2 * dV), atol=1e-4)
+    np.testing.assert_allclose(product.get_vega(SPOTS, t), vega, rtol=1e-12, atol=1e-12)
+    bumped.volatility = VOLATILITY
+    dR = 1e-6
+    bumped.int_rate = INT_RATE + dR
+    rate_up = bumped.price(SPOTS, t)
+    bumped.int_rate = INT_RATE - dR
+    rate_down = bumped.price(SPOTS, t)
+    np.testing.assert_allclose(product.get_rho(SPOTS, t), (rate_up - rate_down) / (2 * dR), atol=1e-4)
+
+@pytest.mark.parametrize('name', PRODUCTS)
+def test_product_greeks_match_elements(name):
+    product = PRODUCTS[name]
+    for t in [TIME_TO_EXP / 2, TIME_TO_EXP]:
+        expected = sum(weight * np.array(element.bs_greeks(SPOTS, t))
+                       for element, weight in zip(product.elements, product.weights))
+        greeks = [product.get_greeks(SPOTS, t)[0], product.get_delta(SPOTS, t), product.get_gamma(SPOTS, t),
+                  product.get_theta(SPOTS, t), product.get_vega(SPOTS, t), product.get_rho(SPOTS, t)]
+        np.testing.assert_allclose(greeks, expected, rtol=1e-10, atol=1e-10)
+
+def test_concurrent_greeks_are_consistent():
+    # threads pricing one product at different spots and times must not see each other's intermediates
+    product = make_products()['calendar_spread']
+    calls = [(SPOTS.repeat(400) + shift, t) for shift in range(10) for t in (0, TIME_TO_EXP / 2, TIME_TO_EXP)]
+    expected = [make_products()['calendar_spread'].get_greeks(spot, t) for spot, t in calls]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda call: product.get_greeks(*call), calls))
+    for greeks, expected_greeks in zip(results, expected):
+        np.testing.assert_array_equal(greeks, expected_greeks)
+
+def test_memoized_price_is_not_shared():
+    product = make_products()['butterfly']
+    price = product.price(SPOTS, 0)
+    price[:] = 0
+    np.testing.assert_allclose(product.price(SPOTS, 0), element_prices(product, SPOTS, 0), rtol=1e-10, atol=1e-10)
+
+def test_memoized_greek_is_not_shared():
+    product = make_products()['butterfly']
+    delta = product.get_delta(SPOTS, 0)
+    expected = delta.copy()
+    delta[:] = 0
+    np.testing.assert_array_equal(product.get_delta(SPOTS, 0), expected)
+    assert len(product._cache) == 1
+
+def test_copied_product_prices_independently():
+    product = make_products()['straddle']
+    price = product.price(SPOTS, 0)
+    short = copy.deepcopy(product)
+    short.weights = short.weights * -1
+    np.testing.assert_allclose(short.price(SPOTS, 0), -price, rtol=1e-12)
+    np.testing.assert_allclose(product.price(SPOTS, 0), price, rtol=1e-12)
+
+def test_memo_cleared_on_parameter_change():
+    product = make_products()['butterfly']
+    price = product.price(100.0, 0)
+    product.volatility = 0.4
+    assert product.price(100.0, 0) != price
+    product.reset_parameters()
+    assert product.price(100.0, 0) == pytest.approx(element_prices(product, 100.0, 0), rel=1e-10)
+
+def test_weights_are_read_only():
+    product = make_products()['bull_spread']
+    with pytest.raises(ValueError):
+        product.weights[1] = -2
+    # assigning new weights reprices
+    product.weights = product.weights * -1
+    assert product.price(100.0, 0) == pytest.approx(-element_prices(make_products()['bull_spread'], 100.0, 0), rel=1e-10)
+
+def test_element_edits_applied_by_reset_parameters():
+    product = make_products()['bull_spread']
+    assert isinstance(product.elements, list)
+    product.price(100.0, 0)
+    product.elements[0].strike = 95
+    product.reset_parameters()
+    expected = sum(weight * OptionElement(type=option_type, strike=strike, time_to_expiry=TIME_TO_EXP,
+                                          volatility=VOLATILITY, int_rate=INT_RATE, div_yield=DIV_YIELD).bs_price(100.0)
+                   for option_type, strike, weight in [('call', 95, 1), ('call', 110, -1)])
+    assert product.price(100.0, 0) == pytest.approx(expected, rel=1e-10)
+    # adding an element, with a weight for it
+    product.elements.append(OptionElement(type='put', strike=100, time_to_expiry=TIME_TO_EXP))
+    product.weights = [1, -1, 2]
+    product.reset_parameters()
+    assert product.elements[2].volatility == VOLATILITY
+    assert product.price(100.0, 0) == pytest.approx(element_prices(product, 100.0, 0), rel=1e-10)
+
+def test_reading_elements_keeps_memo():
+    product = make_products()['condor']
+    product.price(SPOTS, 0)
+    repr(product)
+    assert len(product.elements) == 4
+    assert len(product._cache) == 1 and product._constants is not None
+
+def test_from_arrays_validates_inputs():
+    params = dict(weights=[1, -1], volatility=VOLATILITY, int_rate=INT_RATE, div_yield=DIV_YIELD)
+    with pytest.raises(AssertionError, match="call' or 'put"):
+        StructuredProduct.from_arrays(types=['call', 'swap'], strikes=[90, 110], times_to_expiry=[1, 1], **params)
+    with pytest.raises(AssertionError, match="must match"):
+        StructuredProduct.from_arrays(types=['call', 'put'], strikes=[90, 110, 120], times_to_expiry=[1, 1], **params)
+    with pytest.raises(AssertionError, match="number of weights"):
+        StructuredProduct.from_arrays(types=['call'], strikes=[90], times_to_expiry=[1], **params)
+
+def test_reset_skipped_when_parameters_match(monkeypatch):
+    calls = []
+    monkeypatch.setattr(StructuredProduct, 'reset_parameters', lambda self: calls.append(self))
+    params = dict(volatility=VOLATILITY, int_rate=INT_RATE, div_yield=DIV_YIELD)
+    StructuredProduct([OptionElement(type='call', strike=100, time_to_expiry=1, **params)], [1], **params)
+    assert not calls
+    StructuredProduct([OptionElement(type='call', strike=100, time_to_expiry=1)], [1], **params)
+    assert len(calls) == 1
+
+def test_mismatched_elements_reset_to_product_parameters():
+    element = OptionElement(type='call', strike=100, time_to_expiry=1)
+    StructuredProduct([element], [1], volatility=VOLATILITY, int_rate=INT_RATE, div_yield=DIV_YIELD)
+    assert (element.volatility, element.int_rate, element.div_yield) == (VOLATILITY, INT_RATE, DIV_YIELD)
+
+def test_greeks_leave_product_and_elements_unchanged():
+    product = make_products()['strangle']
+    elements = [dataclasses.astuple(element) for element in product.elements]
+    parameters = (product.volatility, product.int_rate, product.div_yield)
+    product.get_vega(SPOTS, 0)
+    product.get_greeks(SPOTS, TIME_TO_EXP / 2)
+    product.get_rho(100.0, 0)
+    assert [dataclasses.astuple(element) for element in product.elements] == elements
+    assert (product.volatility, product.int_rate, product.div_yield) == parameters
+
+def test_negative_spot_rejected():
+    product = PRODUCTS['straddle']
+    for method in [product.price, product.get_delta, product.get_vega, product.get_greeks]:
+        with pytest.raises(AssertionError):
+            method(-1.0, 0)
+    with pytest.raises(AssertionError):
+        OptionElement(type='call', strike=100, time_to_expiry=1).bs_price(np.array([1.0, -1.0]))